@@ -2,10 +2,15 @@
 Callback handlers for streaming responses in Streamlit
 """
 
+import time
 from typing import Any, Dict, List
 from langchain.callbacks.base import BaseCallbackHandler
 import streamlit as st
 
+# Re-render the answer after this many buffered characters or seconds, whichever comes first
+FLUSH_EVERY_CHARS = 16
+FLUSH_INTERVAL_SECONDS = 0.05
+
 
 class StreamHandler(BaseCallbackHandler):
     """
@@ -15,19 +20,32 @@ class StreamHandler(BaseCallbackHandler):
     def __init__(self, container):
         self.container = container
         self.text = ""
+        self._buffer = ""
+        self._last_flush = time.monotonic()
+        
+    def _flush(self) -> None:
+        """Render buffered tokens; each render re-sends the whole answer, so batch them"""
+        self.text += self._buffer
+        self._buffer = ""
+        self._last_flush = time.monotonic()
+        self.container.markdown(self.text)
         
     def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
         """Called when a new token is generated"""
-        self.text += token
-        self.container.markdown(self.text)
+        self._buffer += token
+        if len(self._buffer) >= FLUSH_EVERY_CHARS or time.monotonic() - self._last_flush > FLUSH_INTERVAL_SECONDS:
+            self._flush()
         
     def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any) -> None:
         """Called when LLM starts generating"""
         self.text = ""
+        self._buffer = ""
+        self._last_flush = time.monotonic()
         
     def on_llm_end(self, response, **kwargs: Any) -> None:
         """Called when LLM finishes generating"""
-        pass
+        if self._buffer:
+            self._flush()
         
     def on_llm_error(self, error: Exception, **kwargs: Any) -> None:
         """Called when LLM encounters an error"""
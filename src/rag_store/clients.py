@@ -0,0 +1,104 @@
+"""
+Shared OpenAI and Upstash clients, created once per process
+
+Async clients hold connections bound to the event loop that used them, so they
+are opened per run with open_async_clients instead of being shared.
+
+LangChain and the SDKs are imported inside the factories so CLI commands that
+never touch OpenAI or Upstash don't pay their import time.
+"""
+
+import contextlib
+import functools
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Keep-alive pool shared by every OpenAI request (embeddings and chat)
+HTTP_MAX_CONNECTIONS = 32
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 16
+# Directory holding embeddings computed during previous indexing runs
+EMBEDDING_CACHE_DIR = "./.cache/embeddings/"
+
+# Settings shared by every OpenAI embeddings client, read once at import
+_EMBEDDING_KWARGS = dict(
+    openai_api_key=os.environ.get("OPENAI_API_KEY"),
+    max_retries=2,
+    timeout=30,
+)
+
+
+def _http_limits():
+    import httpx
+
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def get_http_client():
+    """Pooled HTTP/2 client shared by the OpenAI clients"""
+    import httpx
+
+    return httpx.Client(http2=True, limits=_http_limits())
+
+
+@functools.lru_cache(maxsize=1)
+def get_embeddings(model):
+    """OpenAI embeddings client for model with pooled HTTP connections"""
+    from langchain_openai import OpenAIEmbeddings
+
+    return OpenAIEmbeddings(
+        model=model,
+        **_EMBEDDING_KWARGS,
+        http_client=get_http_client(),
+    )
+
+
+def _disk_cached(embeddings, model):
+    """Wrap embeddings so vectors cached on local disk are reused"""
+    from langchain.embeddings import CacheBackedEmbeddings
+    from langchain.storage import LocalFileStore
+
+    store = LocalFileStore(EMBEDDING_CACHE_DIR)
+    return CacheBackedEmbeddings.from_bytes_store(embeddings, store, namespace=model)
+
+
+def create_vectorstore(embeddings):
+    """Upstash vector store embedding queries with embeddings"""
+    from langchain_community.vectorstores.upstash import UpstashVectorStore
+
+    return UpstashVectorStore(embedding=embeddings)
+
+
+@functools.lru_cache(maxsize=1)
+def get_vectorstore(model):
+    """Upstash vector store using the shared embeddings client for model"""
+    return create_vectorstore(get_embeddings(model))
+
+
+@contextlib.asynccontextmanager
+async def open_async_clients(model):
+    """Disk-cached async embeddings for model and an async Upstash index, closed on exit"""
+    import httpx
+    from langchain_openai import OpenAIEmbeddings
+    from upstash_vector import AsyncIndex
+
+    async with httpx.AsyncClient(http2=True, limits=_http_limits()) as http_async_client:
+        embeddings = OpenAIEmbeddings(
+            model=model,
+            **_EMBEDDING_KWARGS,
+            http_client=get_http_client(),
+            http_async_client=http_async_client,
+        )
+        index = AsyncIndex(
+            url=os.environ.get("UPSTASH_VECTOR_REST_URL"),
+            token=os.environ.get("UPSTASH_VECTOR_REST_TOKEN"),
+        )
+        try:
+            yield _disk_cached(embeddings, model), index
+        finally:
+            # AsyncIndex has no close(), release its connection pool while the loop is running
+            await index._client.aclose()
@@ -1,37 +1,120 @@
-from langchain_openai import OpenAIEmbeddings 
-from langchain_community.vectorstores.upstash import UpstashVectorStore
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+import asyncio
 import click
+import itertools
 import os
 from dotenv import load_dotenv
 import sys
 
 # Handle imports for both src/ and root directory usage
 try:
-    from extraction import extract_papers
+    from clients import open_async_clients
+    from indexing import chunk_digest
 except ImportError:
     # If running from src/ directory, try parent directory
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     try:
-       from extraction import extract_papers
+       from clients import open_async_clients
+       from indexing import chunk_digest
     except ImportError:
         print(f"Exception in import")
-        
-def create_embeddings(batch_size, splits, embedding_model):
-    # Initialize Upstash vector store with OpenAI embeddings
+
+# Upstash accepts at most this many vectors per upsert request
+MAX_UPSERT_BATCH_SIZE = 500
+# Number of consumer tasks upserting batches to Upstash concurrently
+MAX_CONCURRENT_UPSERTS = 8
+# Embedded batches buffered between the embedding producer and the upsert consumers
+MAX_PENDING_BATCHES = 4
+# Metadata key UpstashVectorStore reads the chunk text back from
+TEXT_KEY = "text"
+# Upstash reports throttling only in the error text of the response body
+UPSTASH_RATE_LIMIT_MARKERS = ("rate limit", "limit exceeded", "too many requests")
+
+
+def _is_rate_limited(error):
+    """Return True for HTTP 429 responses (openai.RateLimitError, httpx.HTTPStatusError) and Upstash throttling"""
+    from upstash_vector.errors import UpstashError
+
+    # upstash-vector raises the body's error message without the HTTP status
+    if isinstance(error, UpstashError):
+        message = str(error).lower()
+        return any(marker in message for marker in UPSTASH_RATE_LIMIT_MARKERS)
+
+    # OpenAI status errors carry status_code, httpx status errors carry the response
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+    return status_code == 429
+
+
+_retry_on_rate_limit = retry(
+    retry=retry_if_exception(_is_rate_limited),
+    wait=wait_exponential(multiplier=1, min=1, max=30),
+    stop=stop_after_attempt(5),
+    reraise=True,
+)
+
+
+@_retry_on_rate_limit
+async def _aembed_chunk(embeddings, texts):
+    """Embed one chunk of texts, backing off exponentially when rate limited"""
+    return await embeddings.aembed_documents(texts)
+
+
+@_retry_on_rate_limit
+async def _aupsert_batch(index, batch):
+    """Upsert one batch of vectors, backing off exponentially when rate limited"""
+    await index.upsert(vectors=batch)
+
+
+async def _aindex(embedding_model, splits, batch_size, embeddings_chunk_size):
+    """Embed chunks of splits (any iterable) while previously embedded batches are upserted"""
+    queue = asyncio.Queue(maxsize=MAX_PENDING_BATCHES)
+    ids, errors = [], []
+
+    async def produce(embeddings):
+        try:
+            splits_iter = iter(splits)
+            while chunk := list(itertools.islice(splits_iter, embeddings_chunk_size)):
+                vectors = await _aembed_chunk(embeddings, [doc.page_content for doc in chunk])
+                # Ids derive from chunk text, so re-indexing overwrites instead of duplicating
+                records = [
+                    (chunk_digest(doc.page_content).hex(), vector, {**doc.metadata, TEXT_KEY: doc.page_content})
+                    for doc, vector in zip(chunk, vectors)
+                ]
+                for j in range(0, len(records), batch_size):
+                    await queue.put(records[j:j + batch_size])
+        except Exception as e:
+            errors.append(e)
+        finally:
+            for _ in range(MAX_CONCURRENT_UPSERTS):
+                await queue.put(None)
+
+    async def consume(index):
+        while (batch := await queue.get()) is not None:
+            try:
+                await _aupsert_batch(index, batch)
+                ids.extend(record[0] for record in batch)
+            except Exception as e:
+                errors.append(e)
+
+    # Clients are opened on this run's event loop and closed before it ends
+    async with open_async_clients(embedding_model) as (embeddings, index):
+        await asyncio.gather(produce(embeddings), *[consume(index) for _ in range(MAX_CONCURRENT_UPSERTS)])
+    return ids, errors
+
+
+def create_embeddings(batch_size, splits, embedding_model, embeddings_chunk_size=1000):
+    # Embed with OpenAI and upsert into Upstash as two overlapping stages
     try:
-        # Use OpenAI embeddings
-        embeddings = OpenAIEmbeddings(
-            model=embedding_model,
-            openai_api_key=os.environ.get("OPENAI_API_KEY")
-        )
-        
-        upstash_vector_store = UpstashVectorStore(embedding=embeddings)
-        
-        click.echo(f"Indexing {len(splits)} chunks to Upstash...")
-        ids = upstash_vector_store.add_documents(splits, batch_size=batch_size)
+        batch_size = min(batch_size, MAX_UPSERT_BATCH_SIZE)
+        click.echo(f"Indexing chunks to Upstash in batches of {batch_size}...")
+        ids, errors = asyncio.run(_aindex(embedding_model, splits, batch_size, embeddings_chunk_size))
+        if errors:
+            click.echo(f"❌ {len(errors)} batch(es) failed to index")
+            raise errors[0]
         click.echo(f"✅ Successfully indexed {len(ids)} vectors to Upstash")
-        
+
     except Exception as e:
         click.echo(f"❌ Error during indexing: {e}")
         raise
-    
@@ -1,81 +1,73 @@
+import asyncio
 import urllib.parse
-import requests
-from tqdm import tqdm
-import time
+import aiohttp
 
 
-def extract_papers(query: str, max_results: int = 50, max_retries: int = 3):
-    query = urllib.parse.quote(query)
-    url = f"https://paperswithcode.com/api/v1/papers/?q={query}"
-    
-    # Try with retries in case of temporary server issues
+def has_abstract(paper: dict) -> bool:
+    return bool(paper.get("abstract") and paper.get("abstract").strip())
+
+
+def _keep(papers: list, filter_fn) -> list:
+    return papers if filter_fn is None else [paper for paper in papers if filter_fn(paper)]
+
+
+async def _afetch_page(session: aiohttp.ClientSession, url: str, max_retries: int):
+    """Fetch one results page with retries; returns None once retries are exhausted"""
     for attempt in range(max_retries):
         try:
-            print(f"Attempt {attempt + 1}/{max_retries}: Fetching initial page...")
-            response = requests.get(url, timeout=30)
-            
-            # Check for specific status codes
-            if response.status_code == 500:
-                print(f"Server error (500) - Papers with Code API may be down")
-                if attempt < max_retries - 1:
-                    print(f"Retrying in {2 ** attempt} seconds...")
-                    time.sleep(2 ** attempt)  # Exponential backoff
+            async with session.get(url) as response:
+                if response.status == 500:
+                    print(f"Server error (500) - Papers with Code API may be down")
+                if response.status == 429:
+                    print("Rate limited. Waiting before retry...")
+                    await asyncio.sleep(5)
                     continue
-                else:
-                    print("Max retries reached. Try again later or use an alternative API.")
-                    return []
-            elif response.status_code == 429:
-                print("Rate limited. Waiting before retry...")
-                time.sleep(5)
-                continue
-                
-            response.raise_for_status()
-            response_data = response.json()
-            break  # Success, exit retry loop
-            
-        except (requests.exceptions.RequestException, ValueError) as e:
+                response.raise_for_status()
+                return await response.json()
+
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
             print(f"Error on attempt {attempt + 1}: {e}")
             if attempt < max_retries - 1:
                 print(f"Retrying in {2 ** attempt} seconds...")
-                time.sleep(2 ** attempt)
-            else:
-                print("Max retries reached. The API may be temporarily unavailable.")
-                return []
-    
-    count = response_data["count"]
-    results = []
-    results += response_data["results"]
+                await asyncio.sleep(2 ** attempt)  # Exponential backoff
 
-    # If we already have enough results from the first page, return early
-    if len(results) >= max_results:
-        return results[:max_results][:max_results]
+    print("Max retries reached. The API may be temporarily unavailable.")
+    return None
+
+
+async def aiter_papers(query: str, max_results: int = 50, max_retries: int = 3, filter_fn=None):
+    """Yield papers (accepted by filter_fn when given) as each results page arrives"""
+    query = urllib.parse.quote(query)
+    timeout = aiohttp.ClientTimeout(total=30)
+    yielded = 0
+    page = 1
+
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        while yielded < max_results:
+            url = f"https://paperswithcode.com/api/v1/papers/?page={page}&q={query}"
+            page_data = await _afetch_page(session, url, max_retries)
+            if page_data is None:
+                return
+
+            for paper in _keep(page_data["results"], filter_fn)[:max_results - yielded]:
+                yield paper
+                yielded += 1
+
+            if not page_data.get("next"):
+                return
+            page += 1
 
-    # Calculate how many more pages we actually need
-    pages_needed = ((max_results - len(results)) + 9) // 10  # Ceiling division
-    max_page = min(2 + pages_needed, (count + 9) // 10)  # Don't exceed total pages
-    
-    print(f"Found {count} total papers. Fetching {max_results} papers from {max_page - 1} pages...")
-    
-    for page in tqdm(range(2, max_page + 1), desc="Fetching pages"):
-        url = f"https://paperswithcode.com/api/v1/papers/?page={page}&q={query}"
-        try:
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            page_data = response.json()
-            results += page_data["results"]
-            
-            # Stop if we have enough results
-            if len(results) >= max_results:
-                break
-            
             # Be respectful to the API - add a small delay
-            time.sleep(0.1)
-            
-        except (requests.exceptions.RequestException, ValueError) as e:
-            print(f"Error fetching page {page}: {e}")
-            continue  # Skip this page and continue with others
-    
-    return results
+            await asyncio.sleep(0.1)
+
+
+async def _acollect_papers(query, max_results, max_retries, filter_fn):
+    return [paper async for paper in aiter_papers(query, max_results, max_retries, filter_fn)]
+
+
+def extract_papers(query: str, max_results: int = 50, max_retries: int = 3, filter_fn=None):
+    """Fetch up to max_results papers, counting only those accepted by filter_fn when given"""
+    return asyncio.run(_acollect_papers(query, max_results, max_retries, filter_fn))
 
 
 if __name__ == "__main__":
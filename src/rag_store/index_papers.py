@@ -5,24 +5,25 @@ import sys
 
 # Handle imports for both src/ and root directory usage
 try:
-    from indexing import extract_paper_abstracts, split_and_chunk_documents
+    from indexing import extract_and_split_documents
     from embeddings import create_embeddings
 except ImportError:
     # If running from src/ directory, try parent directory
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     try:
-        from indexing import extract_paper_abstracts, split_and_chunk_documents
+        from indexing import extract_and_split_documents
         from embeddings import create_embeddings
     except ImportError:
         print(f"Exception in import")
 
 @click.command()
 @click.option("--query", type=str, required=True, help="Search query for papers")
-@click.option("--batch_size", type=int, default=32, help="Batch size for indexing")
+@click.option("--batch_size", type=click.IntRange(min=1), default=200, help="Number of vectors per Upstash upsert request (batches above 500 are split)")
+@click.option("--embeddings_chunk_size", type=click.IntRange(min=1), default=1000, help="Number of chunks embedded per OpenAI request")
 @click.option("--max_papers", type=int, default=5, help="Maximum number of papers to extract")
 @click.option("--max_chunks", type=int, default=None, help="Maximum number of text chunks to index")
 @click.option("--embedding_model", type=str, default="text-embedding-3-small", help="OpenAI embedding model")
-def index_papers(query, max_papers, batch_size, max_chunks, embedding_model):
+def index_papers(query, max_papers, batch_size, embeddings_chunk_size, max_chunks, embedding_model):
     
     """Index Papers, Create Embeddings and store in Upstash Vector DB"""
     
@@ -46,16 +47,11 @@ def index_papers(query, max_papers, batch_size, max_chunks, embedding_model):
     
     
     click.echo(f"Testing Complete RAG for query: '{query}'")
-    paper_abstracts = extract_paper_abstracts(query=query,max_papers=max_papers,embedding_model=embedding_model)
-    if not paper_abstracts:
-        return
-    
-    click.echo(f"Testing Splitting and Chunking: '{query}'")
-    splits = split_and_chunk_documents(max_chunks=max_chunks,papers_with_abstracts=paper_abstracts)
+    splits = extract_and_split_documents(query=query,max_papers=max_papers,max_chunks=max_chunks,embedding_model=embedding_model)
     if not splits:
         return
     
-    create_embeddings(batch_size=batch_size,splits=splits,embedding_model=embedding_model)
+    create_embeddings(batch_size=batch_size,splits=splits,embedding_model=embedding_model,embeddings_chunk_size=embeddings_chunk_size)
     
     
     
@@ -1,83 +1,221 @@
 import os
+import asyncio
+import functools
+import itertools
+import hashlib
+import json
+import time
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from langchain.docstore.document import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 import sys
 import click
 
 # Handle imports for both src/ and root directory usage
 try:
-    from extraction import extract_papers
+    from extraction import aiter_papers, has_abstract
 except ImportError:
     # If running from src/ directory, try parent directory
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     try:
-       from extraction import extract_papers
+       from extraction import aiter_papers, has_abstract
     except ImportError:
         print(f"Exception in import")
 
+EMBEDDING_MODEL = "text-embedding-3-small"
 
-def extract_paper_abstracts(query, max_papers, embedding_model):
-    
+# Papers fetched for a (query, max_papers) pair are reused for a day
+PAPERS_CACHE_DIR = Path(".cache/papers")
+PAPERS_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# Chunk sizes are measured in tokens of the embedding model
+CHUNK_SIZE_TOKENS = 400
+CHUNK_OVERLAP_TOKENS = 40
+# Abstracts are truncated below text-embedding-3-small's 8191-token input limit
+MAX_EMBEDDING_INPUT_TOKENS = 8000
+# Chunks shorter than this are merged into their neighbour from the same paper
+MIN_CHUNK_TOKENS = 100
+# Shortest shared text treated as splitter overlap when merging two chunks
+MIN_OVERLAP_CHARS = 20
+
+# Below this many documents, splitting in a thread pool costs more than it saves
+PARALLEL_SPLIT_MIN_DOCUMENTS = 5
+
+
+# tiktoken, LangChain and the splitters are imported on first use so commands
+# that never split text (e.g. test-extraction) start quickly
+
+@functools.lru_cache(maxsize=1)
+def _get_encoding():
+    import tiktoken
+
+    return tiktoken.encoding_for_model(EMBEDDING_MODEL)
+
+
+@functools.lru_cache(maxsize=4096)
+def _tok_len(text):
+    """Token length of text (cached, overlapping splits are measured repeatedly)"""
+    return len(_get_encoding().encode(text, disallowed_special=()))
+
+
+def _join_chunks(first, second):
+    """Concatenate adjacent chunks, dropping the overlap the splitter repeated"""
+    for size in range(min(len(first), len(second)), MIN_OVERLAP_CHARS - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return f"{first} {second}"
+
+
+def _merge_small_chunks(chunks):
+    """Merge chunks under MIN_CHUNK_TOKENS into the previous chunk while it fits CHUNK_SIZE_TOKENS"""
+    merged = []
+    for chunk in chunks:
+        if merged and min(_tok_len(merged[-1].page_content), _tok_len(chunk.page_content)) < MIN_CHUNK_TOKENS:
+            combined = _join_chunks(merged[-1].page_content, chunk.page_content)
+            if _tok_len(combined) <= CHUNK_SIZE_TOKENS:
+                merged[-1].page_content = combined
+                continue
+        merged.append(chunk)
+    return merged
+
+
+def chunk_digest(text):
+    """128-bit blake2b digest identifying a chunk by its text"""
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+
+def _deduplicate_chunks(splits):
+    """Keep the first chunk for each distinct text, listing duplicates' paper ids in its dup_of metadata"""
+    seen = {}
+    duplicates = 0
+    for chunk in splits:
+        first = seen.setdefault(chunk_digest(chunk.page_content), chunk)
+        if first is not chunk:
+            first.metadata.setdefault("dup_of", []).append(chunk.metadata.get("id", ""))
+            duplicates += 1
+    return list(seen.values()), duplicates
+
+
+@functools.lru_cache(maxsize=1)
+def _get_document_splitter():
+    """Return a function splitting one Document into chunk Documents (built once per process)"""
+    from langchain.docstore.document import Document
+
+    try:
+        from semantic_text_splitter import TextSplitter
+    except ImportError:
+        # Rust splitter wheel not installed, fall back to LangChain's splitter
+        TextSplitter = None
+
+    if TextSplitter is not None:
+        splitter = TextSplitter.from_tiktoken_model(
+            EMBEDDING_MODEL, capacity=CHUNK_SIZE_TOKENS, overlap=CHUNK_OVERLAP_TOKENS
+        )
+
+        def split_document(doc):
+            return _merge_small_chunks([
+                Document(page_content=chunk, metadata=dict(doc.metadata))
+                for chunk in splitter.chunks(doc.page_content)
+            ])
+
+        return split_document
+
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE_TOKENS,
+        chunk_overlap=CHUNK_OVERLAP_TOKENS,
+        length_function=_tok_len,
+        separators=["\n\n", "\n", ". ", ".", " "],
+    )
+
+    def split_document(doc):
+        return _merge_small_chunks(text_splitter.split_documents([doc]))
+
+    return split_document
+
+
+def _split_document(doc):
+    """Split one Document, skipping the splitter when it already fits in a single chunk"""
+    if _tok_len(doc.page_content) <= CHUNK_SIZE_TOKENS:
+        return [doc]
+    return _get_document_splitter()(doc)
+
+
+def _papers_cache_path(query, max_papers):
+    key = hashlib.sha1(f"{query}|{max_papers}".encode()).hexdigest()
+    return PAPERS_CACHE_DIR / f"{key}.json"
+
+
+def _load_cached_papers(cache_path):
+    """Return papers cached at cache_path if written within the TTL, else None"""
+    try:
+        if time.time() - cache_path.stat().st_mtime > PAPERS_CACHE_TTL_SECONDS:
+            return None
+        with open(cache_path) as f:
+            return json.load(f)["papers"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _save_cached_papers(cache_path, papers):
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(cache_path, "w") as f:
+        json.dump({"_ts": time.time(), "papers": papers}, f)
+
+
+def _echo_extraction_settings(query, max_papers, embedding_model):
     click.echo(f"Extracting papers matching query: '{query}'")
     click.echo(f"Maximum papers to fetch: {max_papers}")
     click.echo(f"Using OpenAI embedding model: {embedding_model}")
-    
-    # Extract papers with the specified limit
-    papers = extract_papers(query, max_results=max_papers)
-    click.echo(f"Extraction complete ✅: ({len(papers)} papers)")
-    
-    if not papers:
-        click.echo("❌ No papers found. Try a different query.")
-        return
-    
-    # Filter papers that have abstracts (required for indexing)
-    papers_with_abstracts = [
-        paper for paper in papers 
-        if paper.get("abstract") and paper.get("abstract").strip()
-    ]
-    
-    click.echo(f"Papers with abstracts: {len(papers_with_abstracts)}")
+
+
+def _report_papers_with_abstracts(papers_with_abstracts):
+    """Report extraction results (None when nothing is usable)"""
+    click.echo(f"Extraction complete ✅: ({len(papers_with_abstracts)} papers with abstracts)")
     
     if not papers_with_abstracts:
-        click.echo("❌ No papers with abstracts found. Cannot proceed with indexing.")
+        click.echo("❌ No papers with abstracts found. Try a different query.")
         return
     
     return papers_with_abstracts
 
-def split_and_chunk_documents(max_chunks, papers_with_abstracts):
-    
-    # Create documents from papers
-    documents = []
-    for paper in papers_with_abstracts:
-        # Handle missing fields gracefully
-        doc = Document(
-            page_content=paper.get("abstract", ""),
-            metadata={
-                "id": paper.get("id", ""),
-                "arxiv_id": paper.get("arxiv_id", ""),
-                "url_pdf": paper.get("url_pdf", ""),
-                "title": paper.get("title", ""),
-                "authors": paper.get("authors", []),
-                "published": paper.get("published", ""),
-                "url": paper.get("url", ""),
-                "paper_url": paper.get("paper_url", ""),
-            },
-        )
-        documents.append(doc)
 
-    click.echo(f"Created {len(documents)} documents")
+def _paper_document(paper):
+    from langchain.docstore.document import Document
 
-    # Split documents into chunks
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1200,
-        chunk_overlap=200,
-        separators=["\n\n", "\n", ". ", ".", " "],
+    abstract = paper.get("abstract", "")
+    if _tok_len(abstract) > MAX_EMBEDDING_INPUT_TOKENS:
+        encoding = _get_encoding()
+        abstract = encoding.decode(encoding.encode(abstract, disallowed_special=())[:MAX_EMBEDDING_INPUT_TOKENS])
+
+    # Handle missing fields gracefully
+    return Document(
+        page_content=abstract,
+        metadata={
+            "id": paper.get("id", ""),
+            "arxiv_id": paper.get("arxiv_id", ""),
+            "url_pdf": paper.get("url_pdf", ""),
+            "title": paper.get("title", ""),
+            "authors": paper.get("authors", []),
+            "published": paper.get("published", ""),
+            "url": paper.get("url", ""),
+            "paper_url": paper.get("paper_url", ""),
+        },
     )
-    
-    click.echo("Splitting documents into chunks...")
-    splits = text_splitter.split_documents(documents)
-    click.echo(f"Created {len(splits)} text chunks")
+
+
+def _split_paper(paper):
+    """Build a paper's Document and split it (runs in a worker thread)"""
+    return _split_document(_paper_document(paper))
+
+
+def _finalize_splits(chunks, max_chunks):
+    """Deduplicate and limit split chunks (None when nothing is left to index)"""
+    splits, duplicates = _deduplicate_chunks(chunks)
+    click.echo(f"Created {len(splits) + duplicates} text chunks")
+    if duplicates:
+        click.echo(f"Skipped {duplicates} duplicate chunks")
     
     # Apply chunk limit if specified
     if max_chunks and max_chunks < len(splits):
@@ -89,3 +227,47 @@ def split_and_chunk_documents(max_chunks, papers_with_abstracts):
         return
     
     return splits
+
+
+def split_and_chunk_documents(max_chunks, papers_with_abstracts):
+
+    # Split documents into chunks, tokenizing each abstract in the worker that splits it
+    click.echo(f"Splitting {len(papers_with_abstracts)} documents into chunks...")
+    if len(papers_with_abstracts) >= PARALLEL_SPLIT_MIN_DOCUMENTS:
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            chunk_lists = list(executor.map(_split_paper, papers_with_abstracts))
+    else:
+        chunk_lists = map(_split_paper, papers_with_abstracts)
+    return _finalize_splits(itertools.chain.from_iterable(chunk_lists), max_chunks)
+
+
+async def _aextract_and_split(query, max_papers):
+    """Fetch papers asynchronously, splitting each one in a worker thread as soon as it arrives"""
+    loop = asyncio.get_running_loop()
+    papers, pending = [], []
+    async for paper in aiter_papers(query, max_results=max_papers, filter_fn=has_abstract):
+        papers.append(paper)
+        pending.append(loop.run_in_executor(None, _split_paper, paper))
+    return papers, await asyncio.gather(*pending)
+
+
+def extract_and_split_documents(query, max_papers, max_chunks, embedding_model):
+    """Extract papers and split them into chunks, overlapping paper downloads with splitting"""
+    _echo_extraction_settings(query, max_papers, embedding_model)
+
+    cache_path = _papers_cache_path(query, max_papers)
+    papers_with_abstracts = _load_cached_papers(cache_path)
+    if papers_with_abstracts is not None:
+        # Nothing to download, so there is nothing to overlap the splitting with
+        click.echo(f"Using cached papers from {cache_path}")
+        if not _report_papers_with_abstracts(papers_with_abstracts):
+            return
+        return split_and_chunk_documents(max_chunks, papers_with_abstracts)
+
+    papers, chunk_lists = asyncio.run(_aextract_and_split(query, max_papers))
+    if papers:
+        _save_cached_papers(cache_path, papers)
+
+    if not _report_papers_with_abstracts(papers):
+        return
+    return _finalize_splits(itertools.chain.from_iterable(chunk_lists), max_chunks)
@@ -1,19 +1,22 @@
 import os
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import LRUCache, TTLCache
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_community.vectorstores.upstash import UpstashVectorStore
 
 # Handle imports for both src/ and root directory usage
 try:
     from src.prompts.rag_prompt import RAG_PROMPT_TEMPLATE
     from src.callbacks.streamlit_callback import StreamHandler
+    from src.rag_store.clients import create_vectorstore, get_http_client
 except ImportError:
     # If running from src/ directory, try parent directory
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     try:
         from prompts.rag_prompt import RAG_PROMPT_TEMPLATE
         from callbacks.streamlit_callback import StreamHandler
+        from rag_store.clients import create_vectorstore, get_http_client
     except ImportError:
         # Fallback: define inline
         RAG_PROMPT_TEMPLATE = """
@@ -49,19 +52,69 @@ except ImportError:
                 else:
                     print(token, end="", flush=True)
 
+        def create_vectorstore(embeddings):
+            from langchain_community.vectorstores.upstash import UpstashVectorStore
+
+            return UpstashVectorStore(embedding=embeddings)
+
+        def get_http_client():
+            # Let the OpenAI SDK create its own HTTP client
+            return None
+
 
 load_dotenv()
 
+# Query embeddings are kept for the lifetime of the RAG instance
+QUERY_EMBEDDING_CACHE_SIZE = 256
+# Retrieved context is reused for repeated queries within this window
+CONTEXT_CACHE_SIZE = 256
+CONTEXT_CACHE_TTL_SECONDS = 300
+# Streamed answers and the sources they were grounded on are replayed for repeated questions within this window
+ANSWER_CACHE_SIZE = 256
+ANSWER_CACHE_TTL_SECONDS = 3600
+# Characters of each source document passed on to the UI as its preview
+SOURCE_PREVIEW_CHARS = 500
+
+
+def _normalize_metadata(metadata):
+    """Turn the paper fields shown with each source into plain strings, in place"""
+    authors = metadata.get("authors")
+    metadata["authors"] = ", ".join(authors) if isinstance(authors, list) else str(authors or "")
+    metadata["published"] = str(metadata.get("published") or "")
+    metadata["arxiv_id"] = str(metadata.get("arxiv_id") or "")
+
+
+def _source_payload(document, score):
+    """Display payload for a retrieved document, carrying a preview instead of the full text"""
+    content = document.page_content
+    preview = content[:SOURCE_PREVIEW_CHARS]
+    if len(content) > SOURCE_PREVIEW_CHARS:
+        preview += "..."
+    return {
+        "title": document.metadata.get("title", "No title"),
+        "preview": preview,
+        "metadata": document.metadata,
+        "score": score,
+    }
+
+
 class RAG:
     def __init__(self, chat_box, embeddings):
         self.chat_box = chat_box
         self.embeddings = embeddings
         self.set_llm()
         
-        self.vectorstore = UpstashVectorStore(embedding=embeddings)
+        self.vectorstore = create_vectorstore(embeddings)
+        # cachetools caches aren't thread-safe and one instance serves every Streamlit session
+        self._cache_lock = threading.Lock()
+        self._query_vectors = LRUCache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)
+        self._context_cache = TTLCache(maxsize=CONTEXT_CACHE_SIZE, ttl=CONTEXT_CACHE_TTL_SECONDS)
+        self._answer_cache = TTLCache(maxsize=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL_SECONDS)
 
     def set_llm(self):
         """Initialize the language model with appropriate streaming settings"""
+        from langchain_openai import ChatOpenAI
+
         if self.chat_box:
             # Streamlit mode with streaming
             try:
@@ -84,19 +137,62 @@ class RAG:
             callbacks=callbacks,
             model="gpt-3.5-turbo",
             temperature=0.1,  # Lower temperature for more consistent answers
+            http_client=get_http_client(),
         )
 
+    def _embed_query(self, query):
+        """Embed a query, reusing vectors computed earlier by this instance"""
+        with self._cache_lock:
+            vector = self._query_vectors.get(query)
+        if vector is None:
+            vector = self.embeddings.embed_query(query)
+            with self._cache_lock:
+                self._query_vectors[query] = vector
+        return vector
+
+    def embed_queries(self, queries):
+        """Embed all queries not embedded yet in one OpenAI request, keeping the vectors for later searches"""
+        with self._cache_lock:
+            new_queries = [query for query in dict.fromkeys(queries) if query not in self._query_vectors]
+        if new_queries:
+            try:
+                vectors = self.embeddings.embed_documents(new_queries)
+                with self._cache_lock:
+                    self._query_vectors.update(zip(new_queries, vectors))
+            except Exception as e:
+                # get_context embeds (and reports failures for) each query on its own
+                print(f"Error embedding queries: {e}")
+
+    def get_contexts(self, queries, k=4):
+        """Get context for several queries, embedding all new queries in one OpenAI request"""
+        unique_queries = list(dict.fromkeys(queries))
+        self.embed_queries(unique_queries)
+
+        # Search each distinct query once, then answer in the order queries were given
+        with ThreadPoolExecutor(max_workers=max(len(unique_queries), 1)) as executor:
+            contexts = dict(zip(unique_queries, executor.map(lambda query: self.get_context(query, k=k), unique_queries)))
+        return [contexts[query] for query in queries]
+
     def get_context(self, query, k=4):
-        """Get relevant context from vector store"""
+        """Get relevant context from vector store (cached per query and k)"""
         try:
-            # Use the official similarity_search_with_score method
-            results = self.vectorstore.similarity_search_with_score(query, k=k)
+            with self._cache_lock:
+                cached = self._context_cache.get((query, k))
+            if cached is not None:
+                return cached
+
+            # Embed once (cached) and search by vector so repeated queries skip OpenAI
+            query_vector = self._embed_query(query)
+            results = self.vectorstore.similarity_search_by_vector_with_score(query_vector, k=k)
             context = ""
 
             for doc, score in results:
+                _normalize_metadata(doc.metadata)
                 # Add score and content with separator
                 context += f"[Relevance: {score:.3f}]\n{doc.page_content}\n{'='*50}\n"
             
+            with self._cache_lock:
+                self._context_cache[(query, k)] = (context, results)
             return context, results
             
         except Exception as e:
@@ -108,24 +204,53 @@ class RAG:
         """Format the RAG prompt with question and context"""
         return RAG_PROMPT_TEMPLATE.format(question=question, context=context)
 
+    def _build_prompt(self, query):
+        """Retrieve context for query and format the RAG prompt"""
+        # Get relevant context from vector store
+        context, source_documents = self.get_context(query)
+        
+        if not context.strip():
+            context = "No relevant documents found in the knowledge base."
+        
+        # Format prompt with context
+        return self.get_prompt(query, context), context, source_documents
+
+    def stream(self, query):
+        """Return the source payloads and a generator of answer tokens, replaying both for a cached answer"""
+        with self._cache_lock:
+            cached = self._answer_cache.get(query)
+        if cached is not None:
+            answer, sources = cached
+            return sources, iter([answer])
+
+        prompt, _, source_documents = self._build_prompt(query)
+        sources = [_source_payload(doc, score) for doc, score in source_documents]
+        return sources, self._stream_answer(query, prompt, sources)
+
+    def _stream_answer(self, query, prompt, sources):
+        """Yield the answer token by token, caching it with its sources once complete"""
+        answer = ""
+        for chunk in self.llm.stream(prompt):
+            if chunk.content:
+                answer += chunk.content
+                yield chunk.content
+
+        # Only keep complete answers grounded in retrieved documents
+        if sources:
+            with self._cache_lock:
+                self._answer_cache[query] = (answer, sources)
+
     def predict(self, query):
         """Main prediction method for RAG"""
         try:
-            # Get relevant context from vector store
-            context, source_documents = self.get_context(query)
-            
-            if not context.strip():
-                context = "No relevant documents found in the knowledge base."
-            
-            # Format prompt with context
-            prompt = self.get_prompt(query, context)
+            prompt, context, source_documents = self._build_prompt(query)
             
             # Generate answer using LLM
             answer = self.llm.invoke(prompt)
             
             prediction = {
                 "answer": answer,
-                "source_documents": source_documents,
+                "source_documents": [_source_payload(doc, score) for doc, score in source_documents],
                 "context_used": context,
             }
             return prediction
@@ -1,8 +1,7 @@
 import os
 import sys
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_community.vectorstores.upstash import UpstashVectorStore
+from src.rag_store.clients import get_embeddings
 from src.rag_store.prediction import RAG
 
 
@@ -47,8 +46,8 @@ def test_full_rag(rag_system:RAG, query):
     print("📚 SOURCE DOCUMENTS:")
     source_docs = prediction["source_documents"]
     if source_docs:
-        for i, (doc, score) in enumerate(source_docs, 1):
-            print(f"{i}. {doc.metadata.get('title', 'No title')} (Score: {score:.3f})")
+        for i, source in enumerate(source_docs, 1):
+            print(f"{i}. {source['title']} (Score: {source['score']:.3f})")
     else:
         print("No source documents found.")
     print()
@@ -104,10 +103,7 @@ def main():
     try:
         # Initialize embeddings
         print("🔧 Initializing OpenAI embeddings...")
-        embeddings = OpenAIEmbeddings(
-            model="text-embedding-3-small",
-            openai_api_key=os.environ.get("OPENAI_API_KEY")
-        )
+        embeddings = get_embeddings("text-embedding-3-small")
         
         # Initialize RAG system (no chat_box for terminal)
         print("🔧 Initializing RAG system...")
@@ -131,9 +127,9 @@ def main():
         ]
         
         print("🧪 Quick test with sample queries:")
-        for query in sample_queries:
+        sample_contexts = rag.get_contexts(sample_queries, k=2)
+        for query, (context, results) in zip(sample_queries, sample_contexts):
             print(f"\n🔍 Testing: '{query}'")
-            context, results = rag.get_context(query, k=2)
             if results:
                 print(f"✅ Found {len(results)} relevant documents")
             else:
@@ -1,8 +1,10 @@
 import os
+import threading
 from dotenv import load_dotenv
 import streamlit as st
-from langchain_openai import OpenAIEmbeddings
+from src.rag_store.clients import get_embeddings
 from src.rag_store.prediction import RAG
+from src.callbacks.streamlit_callback import StreamHandler
 
 st.set_page_config(
     page_title="Chat with Papers",
@@ -11,106 +13,138 @@ st.set_page_config(
 )
 load_dotenv()
 
-# Check required environment variables
-required_vars = ["OPENAI_API_KEY", "UPSTASH_VECTOR_REST_URL", "UPSTASH_VECTOR_REST_TOKEN"]
-missing_vars = [var for var in required_vars if not os.environ.get(var)]
+# Suggested in the "Example Questions" expander, their embeddings are computed in the background
+EXAMPLE_QUESTIONS = [
+    "What are the main attention mechanisms used in transformers?",
+    "How do self-attention and cross-attention differ?",
+    "What are the computational complexities of different attention methods?",
+    "Which papers discuss multi-head attention?",
+    "What are the recent improvements to the transformer architecture?",
+]
 
-if missing_vars:
-    st.error(f"❌ Missing environment variables: {', '.join(missing_vars)}")
-    st.info("Please add them to your .env file:")
-    for var in missing_vars:
-        if var == "OPENAI_API_KEY":
-            st.code(f"{var}=sk-your-openai-api-key-here")
-        else:
-            st.code(f"{var}=your-{var.lower().replace('_', '-')}-value")
-    st.stop()
+# Credentials are read once at import so every rerun sees the same configuration
+OPENAI_KEY = os.environ.get("OPENAI_API_KEY")
+UPSTASH_URL = os.environ.get("UPSTASH_VECTOR_REST_URL")
+UPSTASH_TOKEN = os.environ.get("UPSTASH_VECTOR_REST_TOKEN")
+
+def check_environment():
+    """Check required environment variables (once per session, reruns skip it after it passes)"""
+    if st.session_state.get("env_checked"):
+        return
 
+    required_vars = {
+        "OPENAI_API_KEY": OPENAI_KEY,
+        "UPSTASH_VECTOR_REST_URL": UPSTASH_URL,
+        "UPSTASH_VECTOR_REST_TOKEN": UPSTASH_TOKEN,
+    }
+    missing_vars = [var for var, value in required_vars.items() if not value]
+
+    if missing_vars:
+        st.error(f"❌ Missing environment variables: {', '.join(missing_vars)}")
+        st.info("Please add them to your .env file:")
+        for var in missing_vars:
+            if var == "OPENAI_API_KEY":
+                st.code(f"{var}=sk-your-openai-api-key-here")
+            else:
+                st.code(f"{var}=your-{var.lower().replace('_', '-')}-value")
+        st.stop()
+
+    st.session_state["env_checked"] = True
+
+@st.cache_resource
 def get_embedding_model():
-    """Get OpenAI embeddings model (cached for performance)"""
+    """Get OpenAI embeddings model (cached across reruns and sessions)"""
     try:
-        embeddings = OpenAIEmbeddings(
-            model="text-embedding-3-small",
-            openai_api_key=os.environ.get("OPENAI_API_KEY")
-        )
+        embeddings = get_embeddings("text-embedding-3-small")
         return embeddings
     except Exception as e:
         st.error(f"Failed to initialize OpenAI embeddings: {e}")
         st.stop()
 
-def load_rag(_chat_box):
-    """Load RAG system with OpenAI embeddings (cached for performance)"""
-    embeddings = get_embedding_model()
+@st.cache_resource(show_spinner=False)
+def _build_rag():
+    """Create the RAG system and test its connection once (cached across reruns and sessions)"""
+    rag = RAG(None, get_embedding_model())
+    connected = rag.test_connection()
+    if connected:
+        # Query vectors never go stale, so only they are prewarmed (searches stay fresh);
+        # a daemon thread keeps the batched OpenAI request off the first question's path
+        threading.Thread(target=rag.embed_queries, args=(EXAMPLE_QUESTIONS,), daemon=True).start()
+    return rag, connected
+
+def load_rag():
+    """Load the shared RAG system"""
     try:
-        rag = RAG(_chat_box, embeddings)
-        
-        # Test the connection on startup
-        if rag.test_connection():
-            st.success("✅ Connected to vector database successfully!")
-        else:
-            st.warning("⚠️ Vector database connection test failed. You may need to index some papers first.")
-        
-        return rag
+        rag, connected = _build_rag()
     except Exception as e:
         st.error(f"Failed to initialize RAG system: {e}")
         st.stop()
 
+    # Connection was tested when the RAG system was built
+    if connected:
+        st.success("✅ Connected to vector database successfully!")
+    else:
+        # Don't keep a failed build, so the next run tests the connection again
+        _build_rag.clear()
+        st.warning("⚠️ Vector database connection test failed. You may need to index some papers first.")
+    
+    return rag
+
 def display_source_documents(source_documents):
     """Display source documents with metadata"""
     if not source_documents:
         st.info("No source documents found.")
         return
         
-    for i, (document, score) in enumerate(source_documents):
-        metadata = document.metadata
-        document_content = document.page_content
+    for i, source in enumerate(source_documents):
+        metadata = source["metadata"]
+        title = source["title"]
+        score = source["score"]
 
         # Extract metadata with fallbacks
         id_ = metadata.get("id", "Unknown")
-        arxiv_id = metadata.get("arxiv_id", "N/A")
+        arxiv_id = metadata.get("arxiv_id", "")
         url_pdf = metadata.get("url_pdf", "")
-        title = metadata.get("title", "No title")
-        authors = metadata.get("authors", [])
-        published = metadata.get("published", "Unknown")
+        authors = metadata.get("authors", "")
+        published = metadata.get("published", "")
+
+        lines = [
+            f"**📰 Document {i+1}**: {title}",
+            f"**🎯 Relevance Score**: {score:.3f}",
+        ]
+        
+        if arxiv_id:
+            lines.append(f"**🏷️ ArXiv ID**: `{arxiv_id}`")
+        
+        if authors:
+            lines.append(f"**✍️ Authors**: {authors}")
+        
+        if published:
+            lines.append(f"**📅 Published**: {published}")
+        
+        if url_pdf:
+            lines.append(f"**🔗 PDF**: [Download Link]({url_pdf})")
 
         with st.container(border=True):
-            st.markdown(f"**📰 Document {i+1}**: {title}")
-            st.markdown(f"**🎯 Relevance Score**: {score:.3f}")
-            
-            if arxiv_id and arxiv_id != "N/A":
-                st.markdown(f"**🏷️ ArXiv ID**: `{arxiv_id}`")
-            
-            if authors:
-                if isinstance(authors, list):
-                    authors_str = ", ".join(authors)
-                else:
-                    authors_str = str(authors)
-                st.markdown(f"**✍️ Authors**: {authors_str}")
-            
-            if published and published != "Unknown":
-                st.markdown(f"**📅 Published**: {published}")
-            
-            if url_pdf:
-                st.markdown(f"**🔗 PDF**: [Download Link]({url_pdf})")
+            # One markdown element per document instead of one per field
+            st.markdown("\n\n".join(lines))
             
             # Show content preview
             with st.expander(f"📄 Content Preview", expanded=False):
-                st.write(document_content[:500] + "..." if len(document_content) > 500 else document_content)
+                st.write(source["preview"])
 
 
 # Main UI
 def load_streamlit_app():
     
+    check_environment()
+
     st.title("📚 Chat with Research Papers")
     st.markdown("Ask questions about research papers in your knowledge base!")
 
-    # Initialize RAG system
-    with st.spinner("Initializing RAG system..."):
-        columns = st.columns(2)
-        
-        with columns[0]:
-            chat_box = st.empty()
-        
-        rag = load_rag(chat_box)
+    # Connection status is shown here once the RAG system is loaded
+    status = st.container()
+    columns = st.columns(2)
 
     # Input section
     st.markdown("---")
@@ -121,37 +155,37 @@ def load_streamlit_app():
 
     # Add some example questions
     with st.expander("💡 Example Questions"):
-        st.markdown("""
-        - What are the main attention mechanisms used in transformers?
-        - How do self-attention and cross-attention differ?
-        - What are the computational complexities of different attention methods?
-        - Which papers discuss multi-head attention?
-        - What are the recent improvements to the transformer architecture?
-        """)
+        st.markdown("\n".join(f"- {question}" for question in EXAMPLE_QUESTIONS))
 
     # Process question
     if input_question.strip() != "":
+        # Initialize RAG system on the first question (cached afterwards)
+        with status, st.spinner("Initializing RAG system..."):
+            rag = load_rag()
+
         with st.spinner("🔍 Searching knowledge base and generating answer..."):
             try:
-                prediction = rag.predict(input_question)
+                # Sources come with the answer so a replayed answer shows the documents it used
+                source_documents, tokens = rag.stream(input_question)
                 
-                answer = prediction["answer"]
-                source_documents = prediction["source_documents"]
+                # Display sources while the answer is still being generated
+                with columns[1]:
+                    st.markdown("### 📚 Source Documents")
+                    display_source_documents(source_documents)
+                
+                # Stream the answer into the chat box, re-rendering in buffered batches
+                columns[0].markdown("### 🤖 Answer")
+                stream_handler = StreamHandler(columns[0].empty())
+                for token in tokens:
+                    stream_handler.on_llm_new_token(token)
+                stream_handler.on_llm_end(None)
                 
-                # Display results
                 with columns[0]:
-                    st.markdown("### 🤖 Answer")
-                    st.markdown(answer)
-                    
                     # Show context info
                     if source_documents:
                         st.info(f"📊 Found {len(source_documents)} relevant source documents")
                     else:
                         st.warning("No relevant documents found in the knowledge base")
-                
-                with columns[1]:
-                    st.markdown("### 📚 Source Documents")
-                    display_source_documents(source_documents)
                     
             except Exception as e:
                 st.error(f"❌ Error generating answer: {e}")
@@ -162,12 +196,12 @@ def load_streamlit_app():
         st.markdown("### 📊 System Status")
         
         # Show environment status
-        if os.environ.get("OPENAI_API_KEY"):
+        if OPENAI_KEY:
             st.success("✅ OpenAI API Key configured")
         else:
             st.error("❌ OpenAI API Key missing")
         
-        if os.environ.get("UPSTASH_VECTOR_REST_URL") and os.environ.get("UPSTASH_VECTOR_REST_TOKEN"):
+        if UPSTASH_URL and UPSTASH_TOKEN:
             st.success("✅ Upstash Vector DB configured")
         else:
             st.error("❌ Upstash Vector DB not configured")